@@ -0,0 +1,45 @@
+"""
+Compiled kernel for breadth-first search, used by `BFS.bfs` when numba is installed.
+
+The queue is a preallocated array of one slot per node with a head and a tail index, since every node is enqueued at most once.
+"""
+import numpy as np
+from numba import njit, types
+
+_i4_1d = types.Array(types.int32, 1, 'C')
+
+
+@njit(types.Tuple((_i4_1d, _i4_1d, types.boolean))(_i4_1d, _i4_1d, types.int32, types.int32, types.int32), cache=True)
+def _bfs_csr(indptr, indices, start, end, n):
+    """
+    indptr, indices: CSR arrays of the adjacency matrix
+    start: index of the node the traversal is started from
+    end: index of the node to find the shortest path to, or -1 to traverse every node reachable from start
+    n: number of nodes in the graph
+
+    Follows the same steps as `BFS.bfs`. Returns (parent, order, found): parent[v] is the node v was reached from (-1 for start and for
+    nodes that were not reached), order is the nodes in the order they were enqueued, and found is True if end was dequeued.
+    The traversal stops as soon as end is dequeued, so order only holds the nodes enqueued up to that point.
+    """
+    parent = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.uint8)
+    queue = np.empty(n, dtype=np.int32)
+    head = 0
+    tail = 0
+    queue[tail] = start
+    tail += 1
+    visited[start] = 1
+
+    while head < tail:
+        u = queue[head]
+        head += 1
+        if u == end:
+            return parent, queue[:tail], True
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if not visited[v]:
+                visited[v] = 1
+                parent[v] = u
+                queue[tail] = v
+                tail += 1
+    return parent, queue[:tail], False
@@ -0,0 +1,131 @@
+"""
+Compiled kernel for Prim's algorithm, used by `Graph.construct_mst` when numba is installed.
+
+Numba cannot compile `heapq` or tuples of python objects, so the priority queue is represented as two parallel
+arrays (`heap_w`, `heap_v`) holding the (weight, destination_node) of each entry, with the binary-heap sift
+operations written out by hand.
+"""
+import numpy as np
+from numba import njit, types
+
+_i4_1d = types.Array(types.int32, 1, 'C')
+_f4_1d = types.Array(types.float32, 1, 'C')
+_f8_1d = types.Array(types.float64, 1, 'C')
+
+
+@njit(cache=True)
+def _heap_less(heap_w, heap_v, i, j):
+    """
+    True if the entry at heap position i has higher priority than the entry at position j. Entries are compared as
+    (weight, destination_node) tuples, the same way heapq compares them, so ties are broken identically
+    and the compiled and pure python constructions return the same MST.
+    """
+    if heap_w[i] != heap_w[j]:
+        return heap_w[i] < heap_w[j]
+    return heap_v[i] < heap_v[j]
+
+
+@njit(cache=True)
+def _heap_swap(heap_w, heap_v, i, j):
+    """ Swap the entries at heap positions i and j in both parallel arrays """
+    heap_w[i], heap_w[j] = heap_w[j], heap_w[i]
+    heap_v[i], heap_v[j] = heap_v[j], heap_v[i]
+
+
+@njit(cache=True)
+def _heap_push(heap_w, heap_v, size, weight, v):
+    """
+    Insert the entry (weight, v) at the end of the heap and sift it up until its parent has higher priority.
+    Returns the new heap size.
+    """
+    heap_w[size] = weight
+    heap_v[size] = v
+    child = size
+    while child > 0:
+        parent = (child - 1) // 2
+        if not _heap_less(heap_w, heap_v, child, parent):
+            break
+        _heap_swap(heap_w, heap_v, child, parent)
+        child = parent
+    return size + 1
+
+
+@njit(cache=True)
+def _heap_pop(heap_w, heap_v, size):
+    """
+    Move the highest priority entry (heap position 0) to position size-1, then sift the entry that replaced it at
+    the root down until both of its children have lower priority. The popped entry is read by the caller from
+    position size-1, which is the new heap size returned by this function.
+    """
+    size -= 1
+    _heap_swap(heap_w, heap_v, 0, size)
+    parent = 0
+    while True:
+        child = 2 * parent + 1
+        if child >= size:
+            break
+        if child + 1 < size and _heap_less(heap_w, heap_v, child + 1, child):
+            child += 1
+        if not _heap_less(heap_w, heap_v, child, parent):
+            break
+        _heap_swap(heap_w, heap_v, child, parent)
+        parent = child
+    return size
+
+
+@njit([types.Tuple((_i4_1d, _i4_1d, _f4_1d))(_i4_1d, _i4_1d, _f4_1d, types.int32, types.int32), #float32 weights, as loaded from CSV files
+       types.Tuple((_i4_1d, _i4_1d, _f8_1d))(_i4_1d, _i4_1d, _f8_1d, types.int32, types.int32)], cache=True)
+def _prim_csr(indptr, indices, data, start, n):
+    """
+    indptr, indices, data: CSR arrays of the adjacency matrix. data can be float32 or float64; the weights returned have the same dtype
+    start: index of the node MST construction is started from
+    n: number of nodes in the graph
+
+    Follows the same steps as `Graph.construct_mst`: `key[v]` holds the weight of the lowest weight edge found so far between
+    the MST and vertex v, and `parent[v]` the vertex at the MST end of that edge. An entry is pushed onto the heap only when
+    an edge lowers the key of a vertex outside the MST, and popped entries whose vertex is already in the MST are stale and skipped.
+    Each entry is pushed while relaxing a distinct edge, so the heap never holds more than len(data) entries.
+
+    Returns (rows, cols, weights): rows[k], cols[k] are the endpoints of the k-th edge added to the MST and weights[k]
+    is its weight. If the graph is not connected, only the edges of the tree spanning the component of `start` are returned.
+    """
+    heap_w = np.empty(data.shape[0], dtype=data.dtype)
+    heap_v = np.empty(data.shape[0], dtype=np.int32)
+    size = 0
+
+    rows = np.empty(max(n - 1, 0), dtype=np.int32)
+    cols = np.empty(max(n - 1, 0), dtype=np.int32)
+    weights = np.empty(max(n - 1, 0), dtype=data.dtype)
+    num_edges = 0
+
+    key = np.full(n, np.inf, dtype=data.dtype)
+    parent = np.full(n, -1, dtype=np.int32)
+    visited = np.zeros(n, dtype=np.bool_)
+    u = start
+    visited[u] = True
+
+    while True:
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if not visited[v] and data[k] < key[v]:
+                key[v] = data[k]
+                parent[v] = u
+                size = _heap_push(heap_w, heap_v, size, data[k], v)
+
+        u = -1
+        while size > 0:
+            size = _heap_pop(heap_w, heap_v, size)
+            if not visited[heap_v[size]]:
+                u = heap_v[size]
+                break
+        if u < 0:
+            break
+        rows[num_edges] = parent[u]
+        cols[num_edges] = u
+        weights[num_edges] = heap_w[size]
+        num_edges += 1
+        visited[u] = True
+        if num_edges == n - 1: #every edge of the last vertex to join ends at a vertex already in the MST
+            break
+
+    return rows[:num_edges], cols[:num_edges], weights[:num_edges]
@@ -1,7 +1,11 @@
-import networkx as nx
 from collections import deque
 from typing import Union
 import numpy as np
+from .graph import _csr_adjacency, _kernel_index_arrays, _load_csv
+try:
+    from ._bfs_numba import _bfs_csr #compiled version of the loop in bfs; only available if numba is installed
+except ImportError:
+    _bfs_csr = None
 
 class BFS:
     """
@@ -14,16 +18,28 @@ class BFS:
             self.adj_mat = adjacency_mat
         else: 
             raise TypeError('Input must be a valid path or an adjacency matrix')
-        self.graph = nx.Graph(self.adj_mat)
+        self._graph = None #networkx version of the graph, only built if the `graph` property is accessed
+        sparse_adj_mat, self._perm, self._inv_perm = _csr_adjacency(self.adj_mat) #compressed sparse row copy of adj_mat, possibly with renumbered nodes (see `_csr_adjacency` in graph.py); bfs reads neighbors from it instead of scanning dense rows
+        self._indptr, self._indices = _kernel_index_arrays(sparse_adj_mat) #neighbors of node u are self._indices[self._indptr[u]:self._indptr[u+1]]. int32, as taken by the compiled kernel, unless the graph has too many edges for int32
+
+    @property
+    def graph(self):
+        """ 
+        The graph as a networkx.Graph. bfs does not use it, so it is only built (and networkx only imported) the first time this property is accessed.
+        Building it allocates a python dict for every node and edge, which costs far more than the CSR arrays bfs uses.
+        """
+        if self._graph is None:
+            import networkx as nx
+            self._graph = nx.Graph(self.adj_mat)
+        return self._graph
 
     def _load_adjacency_matrix_from_csv(self, path: str) -> np.ndarray:
-        with open(path) as f:
-            return np.loadtxt(f, delimiter=',')
+        return _load_csv(path)
     
     def __trace_path(self,parent,start,end=None):
         """
         This method traces back the path to find the end node by utilizing a dictionary `parent`, whose values
-        are the parent nodes to the keys. Specifically, the method:
+        are the parent nodes to the keys. The compiled traversal hands over a list instead, where parent[node] is likewise the parent of node. Specifically, the method:
         1. Initiates a list, `path`, with only the end node inside the list.
         While the last item in the list `path` is not the start node:
         2. Finds the parent of the end node by accessing `parent` using the end node as a key.
@@ -42,7 +58,7 @@ class BFS:
         This method is only meant to be accessed from within the bfs method
 
         """
-        if end: #True if end != None
+        if end is not None: #True if there is an end node. Checked with `is not None` so that node 0 can be an end node
             path = [end] #if there was an end node, initialize the list with it inside.
             
             while path[-1] != start: #once path contains all nodes from end->start exit the loop
@@ -50,29 +66,65 @@ class BFS:
                 path.append(parent_node)
             return path[::-1] #reverse path so it has order start->end then return it
 
+    def __original_numbering(self, nodes):
+        """ Translates a list of nodes numbered as in the reordered CSR arrays back to the numbering of adj_mat. Only meant to be accessed from within the bfs method """
+        if self._perm is None:
+            return nodes
+        return self._perm[nodes].tolist()
+
     def bfs(self, start, end=None):
         """
         This method works as follows:
         * Instantiate an empty `parent` dictionary that will be used to help trace back the shortest, if one exists.
-        * Instantiate a visited list and include the start node as the first element. This list will ensure elements won't be re-added to the queue
+        * Instantiate a `visited` bytearray with one flag per node and mark the start node. Checking a flag is O(1), unlike searching a list, and ensures elements won't be re-added to the queue
+        * Instantiate an `order` list with the start node as the first element. This records the order of traversal
         * Instantiate the queue and include the start node as the first element. The queue represents the order of nodes that need to be traversed next, and will be built up to ensure the graph is a traversed in a layer-by-layer, breadth-first manner.
 
         While the queue is not empty:
         1. Mark the first node in the queue as the current node and dequeue it.
         2. If the current node is the end node, break the loop by returning the shortest path via __trace_path. This path is guaranteed to be the shortest path because BFS was used.
-        3. If the current node is not the end node, iterate through the current node's outgoing neighbors, adding unvisited ones to the end of the queue and marking them as visited. Additionally, add each neighbor as a key in `parent` with the current node as the value.
-            Mark them as visited here because all nodes in the graph will be visited in the same order they appear in the queue anyways, and the if statement condition prevents nodes from appearing in the visited list more than once, preventing cycles from hurting the algorithm.
+        3. If the current node is not the end node, iterate through the current node's outgoing neighbors, adding unvisited ones to the end of the queue and to `order`, and marking them as visited. Additionally, add each neighbor as a key in `parent` with the current node as the value.
+            Mark them as visited here because all nodes in the graph will be visited in the same order they appear in the queue anyways, and the if statement condition prevents nodes from being added to the queue more than once, preventing cycles from hurting the algorithm.
             At this point, the current node is the parent node of each of its outgoing neighbors. Adding each of these neighbors as a key with the current node as a value into the `parent` dictionary will allow backtracing in the following manner:
                 The final outoing neighbor, the end node, can be looked up in the dictionary as a key and it's parent node will be returned as a value. The parent node can then be looked up as a key and it's parent node will be returned. 
                 Continue in this manner until the start node is returned, and you will have a list from end node -> start node. Reverse that list to get the shortest path. That is what __trace_path is doing.
         4. Repeat 1-3 until the end node is found or the queue becomes empty
             4a. If the end node is found, return the shortest path via __trace_path
-            4b. If there is no end node defined, return the order of traversal which is the visited list.
+            4b. If there is no end node defined, return the order of traversal which is the `order` list.
             4c. If the queue becomes empty, and there was an end node defined, there must not be a path, or the path would have been found. Return None
+
+        If numba is installed, steps 1-4 are run by `_bfs_csr` in `_bfs_numba.py` instead, which follows the same steps in compiled code and returns
+        the `parent` of each node as an array along with the order of traversal. The shortest path is then traced back from `parent` with __trace_path as usual.
+        Graphs with too many edges for int32 indices (see `_kernel_index_arrays` in graph.py) always use the python loop.
+
+        Raises IndexError if start, or end if it is given, is not between 0 and the number of nodes - 1.
+
+        For large graphs the CSR arrays use renumbered nodes (see `_csr_adjacency` in graph.py). In that case start and end are translated to their
+        new numbers before the traversal, and the returned path or order of traversal is translated back to the numbering of adj_mat.
             
         """
+        num_nodes = self.adj_mat.shape[0]
+        if not 0 <= start < num_nodes: #the compiled kernel does no bounds checking, and a negative index would silently wrap around in the python loop
+            raise IndexError(f'start {start} is out of range for a graph with {num_nodes} nodes')
+        if end is not None and not 0 <= end < num_nodes: #-1 also stands for "no end node" in the compiled kernel
+            raise IndexError(f'end {end} is out of range for a graph with {num_nodes} nodes')
+        if self._perm is not None:
+            start = int(self._inv_perm[start]) #number of the start node in the reordered CSR arrays
+            if end is not None:
+                end = int(self._inv_perm[end])
+
+        if _bfs_csr is not None and self._indptr.dtype == np.int32: #numba is installed and the graph is small enough for int32 indices; run the compiled traversal
+            parent, order, found_end = _bfs_csr(self._indptr, self._indices, start, -1 if end is None else end, self.adj_mat.shape[0]) #-1 stands for no end node
+            if end is None:
+                return self.__original_numbering(order.tolist())
+            if found_end:
+                return self.__original_numbering(self.__trace_path(parent.tolist(),start,end))
+            return None
+
         parent = {} #instantiate dictionary that will be used to trace back shortest path between start and end node using __trace_path method.
-        visited = [start] #initialize visited list and include the start node as the first element
+        visited = bytearray(self.adj_mat.shape[0]) #one flag per node, all 0 (unvisited). Indexing a flag is O(1) whereas `in` on a list is O(N)
+        visited[start] = 1 #mark the start node as visited
+        order = [start] #order of traversal, starting with the start node
         
         
         queue = deque([start]) #initialize deque object with start node already inserted
@@ -85,15 +137,17 @@ class BFS:
 
             if current_node == end: #if current node is the end node break the loop by returning the shortest path
                 path = self.__trace_path(parent,start,end)
-                return path #if there is an end node and a path exists, the list of the shortest path will be returned here
+                return self.__original_numbering(path) #if there is an end node and a path exists, the list of the shortest path will be returned here
             else:
-                for out_neighbor in self.graph[current_node]: #iterate through all outgoing neighbors from current node
-                    if out_neighbor not in visited: 
+                out_neighbors = self._indices[self._indptr[current_node]:self._indptr[current_node+1]].tolist() #outgoing neighbors of current node, read from the CSR arrays and converted to a python list once
+                for out_neighbor in out_neighbors: #iterate through all outgoing neighbors from current node
+                    if not visited[out_neighbor]: 
                         parent[out_neighbor] = current_node #current_node is parent node of out_neighbor. This dictionary will be used to backtrace the shortest path in the __trace_path method
                         queue.append(out_neighbor) #add outgoing neighbor to queue if it has not already been visited, to avoid issues with cyclical connections
-                        visited.append(out_neighbor) #add outgoing neighbor to visited list; nodes are visited in the same order they appear in the queue.
+                        visited[out_neighbor] = 1 #mark outgoing neighbor as visited
+                        order.append(out_neighbor) #add outgoing neighbor to order of traversal; nodes are visited in the same order they appear in the queue.
         if end == None: 
-            return visited #the visited list contains the order of traversal
+            return self.__original_numbering(order) #the order list contains the order of traversal
         return None #if queue becomes empty a path was not found. If there is an end node, Return None to indicate there is no path. 
             #This line could have been skipped and the method would return None by default if nothing else was returned. But it is clearer to explicitly return None
 
@@ -1,6 +1,67 @@
 import numpy as np
 import heapq
+from scipy.sparse import csr_matrix, coo_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
 from typing import Union
+try:
+    from ._prim_numba import _prim_csr #compiled version of the loop in construct_mst; only available if numba is installed
+except ImportError:
+    _prim_csr = None
+
+try:
+    import pandas as pd #its C csv parser is much faster than np.loadtxt; only used if installed
+except ImportError:
+    pd = None
+
+RCM_MIN_NODES = 256 #graphs with fewer nodes than this are not reordered; they are small enough to stay in cache, so computing the permutation costs more than it saves
+
+def _load_csv(path: str) -> np.ndarray:
+    """
+    path: CSV file containing a 2D array of floats with no header
+
+    Loads the array as float32, which is plenty for edge weights and halves the memory read when scanning them.
+    Parses it with pandas if it is installed, and with np.loadtxt otherwise. Raises ValueError for missing values or rows of different lengths with either parser.
+    """
+    if pd is not None:
+        adj_mat = np.ascontiguousarray(pd.read_csv(path, header=None, dtype=np.float32).to_numpy()) #pandas hands back a column-major array; rows of adj_mat are read together, so make them contiguous
+        if np.isnan(adj_mat).any(): #pandas fills missing values and short rows with NaN, where np.loadtxt raises
+            raise ValueError(f'{path} has missing values or rows of different lengths')
+        return adj_mat
+    with open(path) as f:
+        return np.loadtxt(f, delimiter=',', dtype=np.float32)
+
+def _csr_adjacency(adj_mat: np.ndarray, positive_only: bool = False):
+    """
+    adj_mat: dense adjacency matrix of an undirected graph
+    positive_only: if True, only elements with weight > 0 are edges, as in Prim's algorithm. Otherwise every nonzero element is an edge, as in BFS
+
+    Returns (sparse_adj_mat, perm, inv_perm). sparse_adj_mat is a CSR copy of adj_mat holding only its edges. If the graph has at least RCM_MIN_NODES nodes,
+    its nodes are renumbered with the Reverse Cuthill-McKee ordering, which gives neighboring nodes nearby indices so that walking from a
+    node to its neighbors reads nearby parts of the CSR arrays instead of jumping around them. In that case node i of sparse_adj_mat is node
+    perm[i] of adj_mat, and node j of adj_mat is node inv_perm[j] of sparse_adj_mat. Otherwise perm and inv_perm are None.
+    """
+    sparse_adj_mat = csr_matrix(adj_mat)
+    if positive_only:
+        sparse_adj_mat.data[~(sparse_adj_mat.data > 0)] = 0 #negative and NaN weights are not edges
+        sparse_adj_mat.eliminate_zeros()
+    if adj_mat.shape[0] < RCM_MIN_NODES:
+        return sparse_adj_mat, None, None
+    perm = reverse_cuthill_mckee(sparse_adj_mat, symmetric_mode=True)
+    inv_perm = np.argsort(perm)
+    return sparse_adj_mat[perm][:, perm], perm, inv_perm
+
+def _kernel_index_arrays(sparse_adj_mat):
+    """
+    sparse_adj_mat: CSR matrix
+
+    Returns (indptr, indices) of sparse_adj_mat as int32, the index type the compiled kernels take. If the matrix has more stored entries than
+    int32 can count, int32 would wrap around and the kernels, which do no bounds checking, would read out of bounds. In that case the arrays are
+    returned as int64 instead, and callers only use the compiled kernels when the arrays are int32.
+    """
+    indptr, indices = sparse_adj_mat.indptr, sparse_adj_mat.indices
+    if indptr[-1] > np.iinfo(np.int32).max:
+        return indptr.astype(np.int64, copy=False), indices.astype(np.int64, copy=False)
+    return indptr.astype(np.int32, copy=False), indices.astype(np.int32, copy=False)
 
 class Graph:
     def __init__(self, adjacency_mat: Union[np.ndarray, str]):
@@ -15,11 +76,17 @@ class Graph:
             self.adj_mat = adjacency_mat
         else: 
             raise TypeError('Input must be a valid path or an adjacency matrix')
+        sparse_adj_mat, self._perm, self._inv_perm = _csr_adjacency(self.adj_mat, positive_only=True) #compressed sparse row copy of the edges (weight > 0) of adj_mat, possibly with renumbered nodes (see _csr_adjacency). Built once so neighbor lookups touch only deg(u) entries instead of a full dense row
+        #neighbors of node u are self._indices[self._indptr[u]:self._indptr[u+1]], with edge weights at the same positions in self._data
+        #the CSR arrays are converted to the dtypes the compiled kernel takes here, once, so that repeated calls to construct_mst (e.g. from every starting node) reuse them instead of converting them on every call
+        self._indptr, self._indices = _kernel_index_arrays(sparse_adj_mat)
+        self._data = sparse_adj_mat.data
+        if self._data.dtype not in (np.float32, np.float64): #the kernel is compiled for float32 and float64 weights
+            self._data = self._data.astype(np.float64)
         self.mst = None
 
     def _load_adjacency_matrix_from_csv(self, path: str) -> np.ndarray:
-        with open(path) as f:
-            return np.loadtxt(f, delimiter=',')
+        return _load_csv(path)
 
     def construct_mst(self,starting_node=0):
         """ 
@@ -28,60 +95,136 @@ class Graph:
         and checking the same MST is constructed
 
         What construct_mst is doing:
-        1) Instantiate the visited_vertices list with an arbitrarily chosen starting node (default is node from idx 0 of adj_mat but can be chosen as an argument)
-        2) instantiate an empty heap for the priority queue
-        3) Instantiate an empty 2D nunpy array of the same shape as adj_mat to hold the MST
+        1) Instantiate the visited_vertices boolean array (one flag per node) and mark an arbitrarily chosen starting node (default is node from idx 0 of adj_mat but can be chosen as an argument). Checking a flag is O(1), unlike searching a list
+        2) Instantiate an empty heap for the priority queue, and the `key` and `parent` arrays. For each vertex not yet in the growing MST, key[vertex] is the weight of the lowest weight edge
+           found so far between the MST and that vertex, and parent[vertex] is the vertex at the MST end of that edge. Before any edges are found, key is infinity and parent is -1 for every vertex
+        3) Instantiate `rows`, `cols` and `weights` arrays of length num_vertices-1 to hold the edges of the MST, since a tree with n nodes has n-1 edges
         4) Add outgoing edges from this starting node to the heap (priority queue), so that you can pick the lowest weight edge to grow the tree.
-            4a) look for outgoing edges using `add_edges_to_pq`; docstring of this function explains how it works
-        5) While the number of number of nodes within the growing MST (the number of nodes in visited_vertices) is less than the total number of nodes:
-            a)Pop the highest priority edge from the priority queue. This edge will (almost) always be the the lowest weight edge because the priority queue is a heap that prioritizes low weights
-            b)A popped edge is of the form (weight, start_node, destination node). If the destination node has not already been added to the growing MST (i.e, if it is not already in visited_vertices):
-                i) Add the edge to the MST adjacency matrix by adding this edge's weight to the MST at position MST[start_node,destination_node]
-                ii) Also add the edge to the opposite side of the MST diagonal by adding this edge's weight at position MST[destination_node,start_node]. This ensures the MST remains symmetric and therefore an undirected graph
+            4a) look for outgoing edges using `add_edges_to_pq`; docstring of this function explains how it works. Only edges that lower the key of their destination vertex are added
+        5) While the number of number of nodes within the growing MST (num_visited, the number of nodes marked in visited_vertices) is less than the total number of nodes:
+            a)Pop the highest priority entry from the priority queue. An entry is of the form (weight, destination_node), and the popped entry is the lowest weight edge between the MST and a vertex outside of it because the priority queue is a heap that prioritizes low weights
+            b)If the destination node has already been added to the growing MST (i.e, if it is already marked in visited_vertices), the entry is stale: skip it. Stale entries are left behind when a vertex's key
+              is lowered, because the entry with the old key stays in the heap. Otherwise:
+                i) Add the edge to the MST by recording parent[destination_node] in `rows`, destination_node in `cols` and the edge's weight in `weights`, at position num_edges
+                ii) Increment num_edges, the number of edges recorded so far
                 iii) At this point, we have grown the MST by adding the minimum weight edge to a vertex not already in the tree. The added edge was the one of minimum weight because a heap was used for the priority queue
-                iv) Add the destination node of the edge to the visited_vertices list
-                v) add all outgoing edges from the node to the priority queue, so edges from this vertex ending at a node not already in the growing MST can possibly be added to the MST (if they are of lowest weight)
+                iv) Mark the destination node of the edge in visited_vertices and increment num_visited
+                v) add outgoing edges from the node to the priority queue, so edges from this vertex ending at a node not already in the growing MST can possibly be added to the MST (if they are of lowest weight)
                 vi) steps iv and v together ensure no edges starting from a node in the MST end at a node already in the MST and therefore prevents a cycle, which would be impossible in a MST.
-            c) repeat a & b until the MST has the same number of edges as the adjacency matrix (i.e len(vsited_vertices) == num_vertices)
-        6) Save the MST in the self.mst attribute
+            c) repeat a & b until the MST has the same number of edges as the adjacency matrix (i.e num_visited == num_vertices), or until the priority queue runs out, which only happens if the graph is not connected
+            d) Because each vertex only has the entries that lowered its key in the heap, instead of one entry per edge into it, the heap holds far fewer entries than the number of edges in the graph
+        6) Build a sparse (CSR) adjacency matrix from the recorded edges, placing each edge on both sides of the diagonal so
+           the MST remains symmetric and therefore an undirected graph. Save it in the self.mst attribute.
+           An MST only has n-1 edges, so storing it sparsely takes O(n) memory instead of the O(n^2) of a dense matrix. Use `self.mst_dense`
+           to get it as a dense numpy array.
+
+        If numba is installed, steps 1-5 are run by `_prim_csr` in `_prim_numba.py` instead, which follows the same steps in compiled code
+        and returns the rows, cols and weights of the edges it added to the MST. Graphs with too many edges for int32 indices (see `_kernel_index_arrays`)
+        always use the python loop.
+
+        If the graph is not connected there is no spanning tree. In that case self.mst only holds the edges of the tree spanning the component
+        of starting_node, and every other node has no edges in it.
+
+        Raises IndexError if starting_node is not between 0 and the number of nodes - 1.
+
+        For large graphs, steps 1-5 work on renumbered nodes (see `_csr_adjacency`). starting_node is translated to its new number
+        before step 1, and `rows` and `cols` are translated back to the numbering of adj_mat in step 6.
 
         """
         num_vertices = self.adj_mat.shape[0] #pick one of the 2 dimensions of the symmetric matrix to get the # of vertices
-        visited_vertices = [starting_node] #instantiate  list of visited vertices with the 0th vertex arbitrarily chosen to be the starting node
+        if not 0 <= starting_node < num_vertices: #the compiled kernel does no bounds checking, and a negative index would silently wrap around in the python loop
+            raise IndexError(f'starting_node {starting_node} is out of range for a graph with {num_vertices} nodes')
+        if self._perm is not None:
+            starting_node = int(self._inv_perm[starting_node]) #number of the starting node in the reordered CSR arrays
+
+        if _prim_csr is not None and self._indptr.dtype == np.int32: #numba is installed and the graph is small enough for int32 indices; run the compiled construction
+            rows, cols, weights = _prim_csr(self._indptr, self._indices, self._data, starting_node, num_vertices)
+            self._save_mst(rows, cols, weights.astype(self.adj_mat.dtype, copy=False))
+            return
+
+        visited_vertices = np.zeros(num_vertices, dtype=bool) #one flag per vertex, all False (not yet in the MST). Indexing a flag is O(1) whereas `in` on a list is O(N)
+        visited_vertices[starting_node] = True #mark the starting node, the 0th vertex by default, as visited
+        num_visited = 1 #number of vertices in the growing MST
         priority_queue = []
         heapq.heapify(priority_queue) #turn priority_queue list into a heap
+        key = np.full(num_vertices, np.inf) #weight of the lowest weight edge found so far between the MST and each vertex
+        parent = np.full(num_vertices, -1, dtype=np.int32) #vertex at the MST end of that edge
+        rows = np.zeros(num_vertices - 1, dtype=np.int32) #start node of each edge in the MST
+        cols = np.zeros(num_vertices - 1, dtype=np.int32) #destination node of each edge in the MST
+        weights = np.zeros(num_vertices - 1, dtype=self.adj_mat.dtype) #weight of each edge in the MST. Same dtype as adj_mat so edge weights are stored without conversion
+        num_edges = 0 #number of edges recorded in rows, cols and weights so far
 
-        MST = np.array([[float(0) for column in range(num_vertices)] for row in range(num_vertices)]) #instantiate MST filled with 0s that will be updated step-by-step
         def add_edges_to_pq(pq,start_node):
             '''
             pq: priority queue to which outgoing edges will be added
-            start_node: All edges from this node will be found and added to the priority queue
+            start_node: All edges from this node will be found and added to the priority queue if they lower the key of their destination node
 
-            This function adds a tuple to the heap (priority queue) of the form (weight, start_node, destination_node)
+            This function adds a tuple to the heap (priority queue) of the form (weight, destination_node)
 
             Strategy:
             1. Find neighboring nodes of start node that form an edge (weight >0)
-                1a. This is done by indexing the row corresponding to the start node in the adjacency matrix, and looking for indices in that row where the value > 0 
-                1b. Those elements are the neighbors that form an edge with the source node
-            2. Add the tuple containing (weight, start_node index, neighbor index) to the priority queue
+                1a. This is done by slicing the CSR arrays built in __init__ between self._indptr[start_node] and self._indptr[start_node+1].
+                1b. The slice of self._indices holds the neighbors that form an edge with the source node, and the same slice of self._data holds the weights of those edges
+            2. Keep the neighbors that are not already in the MST and whose edge with start_node has a lower weight than key[neighbor]. This is done for all neighbors at once with numpy
+                2a. Set key[neighbor] to the weight and parent[neighbor] to start_node for those neighbors, since this is now the lowest weight edge between the MST and each of them
+                2b. Make a list of tuples containing (weight, neighbor index) for those neighbors
+            3. Add the tuples to the priority queue
+                3a. If there are at least as many new tuples as entries already in the priority queue, extend the heap with all of them and re-heapify it. heapify is O(len(pq)),
+                    which is cheaper than sifting each new tuple in one at a time with heappush when the batch is that large. This is always the case for the starting node, where the heap is empty.
+                3b. Otherwise push them one at a time with heappush
 
             '''
+            row_start, row_end = self._indptr[start_node], self._indptr[start_node+1] #positions in the CSR arrays where the edges of start_node begin and end
+            neighbors = self._indices[row_start:row_end]
+            weights = self._data[row_start:row_end]
+            lowers_key = ~visited_vertices[neighbors] & (weights < key[neighbors]) #True for edges that lower the key of a vertex outside the MST
+            neighbors, weights = neighbors[lowers_key], weights[lowers_key]
+            key[neighbors] = weights
+            parent[neighbors] = start_node
+            batch = list(zip(weights.tolist(), neighbors.tolist())) #tuples of form (weight,neighbor_idx). .tolist() converts to python numbers in C once, rather than boxing a numpy scalar per element
+            if len(batch) >= len(pq):
+                pq.extend(batch)
+                heapq.heapify(pq)
+            else:
+                for entry in batch:
+                    heapq.heappush(pq,entry)
+
+        add_edges_to_pq(priority_queue,starting_node)#add edges from the start node to priority_queue
+
+        while num_visited < num_vertices and priority_queue: #while not all nodes have been marked in visited_vertices, and therefore not all nodes have been added to the MST (MST has to be fully connected)
+
+            weight, destination_node = heapq.heappop(priority_queue) #pop lowest weight edge from the priority queue
+            if not visited_vertices[destination_node]: #Check if the destination node is already marked in visited_vertices. If it is then this entry is stale, and adding the edge would form a cycle; skip it
+                rows[num_edges] = parent[destination_node] #start node of the lowest weight edge into destination_node
+                cols[num_edges] = destination_node
+                weights[num_edges] = weight #Add weight of lowest weight edge in PQ to the MST
+                num_edges += 1
+                visited_vertices[destination_node] = True #mark destination vertex as visited
+                num_visited += 1
+                if num_visited < num_vertices: #once the last vertex has joined, every one of its edges ends at a vertex already in the MST; don't look at them
+                    add_edges_to_pq(priority_queue,destination_node) #add outgoing edges from destination vertex to priority_queue
+
+        rows, cols, weights = rows[:num_edges], cols[:num_edges], weights[:num_edges] #fewer than num_vertices-1 edges are recorded if the graph is not connected
+        self._save_mst(rows, cols, weights) #add finished MST to self.mst attribute
+
+    def _save_mst(self, rows: np.ndarray, cols: np.ndarray, weights: np.ndarray):
+        """
+        rows, cols, weights: the k-th edge of the MST goes from node rows[k] to node cols[k] and has weight weights[k]
 
-            for neighbor in np.argwhere(self.adj_mat[start_node]>0):#find neighboring nodes of start node by finding what other nodes form an edge of weight >0 with the start node. Iterate through those neighbors
-
-                neighbor = neighbor[0]#index of neighbor in adjacency matrix is returned in a list of length 1 after using np.argwhere. Get the actual value by indexing it out.  
-                heapq.heappush(priority_queue,(self.adj_mat[start_node,neighbor],start_node,neighbor)) #add tuple to priority_queue with form (weight,visited_node_idx,neighbor_idx)
-
-        add_edges_to_pq(priority_queue,visited_vertices[0])#add edges from the start node in visited_vertices to priority_queue
-
-        while len(visited_vertices) < num_vertices: #while not all nodes have been added to visited_vertices, and therefore not all nodes have been added to the MST (MST has to be fully connected)
-
-            lowest_weight_edge = heapq.heappop(priority_queue) #pop lowest weight edge from the priority queue
-            if lowest_weight_edge[2] not in visited_vertices: #3rd element in tuple is the destination node of the edge. Check if it is already in visited_vertices. If it is then there is already an edge connecting a node in the MST to this node, which is already in the MST. That would form a cycle; skip it
-                MST[lowest_weight_edge[1],lowest_weight_edge[2]] = lowest_weight_edge[0] #Add weight (0th idx) of lowest weight edge in PQ to MST. Add weight to position MST[start_node,destination_node]. Start_node = idx 1 of tuple,  destination node = idx 2 of tuple
-                MST[lowest_weight_edge[2],lowest_weight_edge[1]] = lowest_weight_edge[0] #fill in the same edge weight on the other side of the diagonal so the mst adjacency matrix remains symmetric and therefore undirected
-                visited_vertices.append(lowest_weight_edge[2]) #add destination vertex to visited_vertices
-                add_edges_to_pq(priority_queue,lowest_weight_edge[2]) #add outgoing edges from destination vertex to priority_queue
-
-        self.mst = MST #add finished MST to self.mst attribute
+        Stores the MST in self.mst as a symmetric sparse (CSR) adjacency matrix. Only one direction of each edge is recorded
+        during construction, so each edge is given to the sparse matrix twice, once as (rows, cols) and once as (cols, rows), to fill in
+        both sides of the diagonal in a single conversion to CSR. If the nodes were renumbered
+        (see `_csr_adjacency`), rows and cols are translated back to the numbering of adj_mat first.
+        """
+        num_vertices = self.adj_mat.shape[0]
+        if self._perm is not None:
+            rows, cols = self._perm[rows], self._perm[cols]
+        self.mst = coo_matrix((np.concatenate([weights, weights]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))), shape=(num_vertices, num_vertices)).tocsr()
+
+    @property
+    def mst_dense(self) -> np.ndarray:
+        """ The MST as a new dense numpy adjacency matrix, or None if `construct_mst` has not been called yet """
+        if self.mst is None:
+            return None
+        return self.mst.toarray()
         
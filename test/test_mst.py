@@ -1,9 +1,90 @@
 # write tests for bfs
 import pytest
+import math
 import numpy as np
-from mst import Graph, BFS
-from sklearn.metrics import pairwise_distances
-import networkx as nx
+from mst import Graph
+from scipy.spatial.distance import pdist, squareform
+from scipy.sparse import issparse, csr_matrix
+from scipy.sparse.csgraph import connected_components
+try:
+    from numba import njit #compiles `_check_mst_core`; only used if installed
+except ImportError:
+    njit = None
+try:
+    import simsimd #SIMD kernels for pairwise distances; only used if installed
+except ImportError:
+    simsimd = None
+
+
+def pairwise_distances(coords: np.ndarray) -> np.ndarray:
+    """ 
+    Euclidean distance between every pair of rows of `coords`, as a square matrix.
+    Uses simsimd's SIMD squared distances if it is installed, and scipy's pdist otherwise
+    """
+    if simsimd is not None:
+        coords = np.ascontiguousarray(coords)
+        dist_mat = np.asarray(simsimd.cdist(coords, coords, metric='sqeuclidean'), dtype=coords.dtype)
+        return np.sqrt(dist_mat, out=dist_mat)
+    return squareform(pdist(coords, metric='euclidean'))
+
+CHECK_MST_COMPILED_MIN_NODES = 256 #`check_mst` runs checks 1-3 with the compiled `_check_mst_core` for MSTs with at least this many nodes, if numba is installed. Below this, compiling it costs more than it saves
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _check_mst_core(mst, adj_mat, allowed_error):
+        """
+        Runs checks 1-3 of `check_mst` in a single compiled pass over the lower triangle of the dense MST `mst`.
+        Returns (total, max_asymmetry, num_edges, edges_in_adj_mat): the total weight of the MST, the largest absolute difference between an element
+        below the diagonal and its mirror above it, the number of edges in the lower triangle, and whether every one of those edges is within
+        `allowed_error` of the edge between the same nodes in adj_mat
+        """
+        total = 0.0
+        max_asymmetry = 0.0
+        num_edges = 0
+        edges_in_adj_mat = True
+        for i in range(mst.shape[0]):
+            for j in range(i + 1): #iterate through elements in lower triangle of MST
+                weight = mst[i, j]
+                asymmetry = abs(weight - mst[j, i])
+                if asymmetry > max_asymmetry:
+                    max_asymmetry = asymmetry
+                if weight > 0: #element is an edge
+                    total += weight
+                    num_edges += 1
+                    if not abs(weight - adj_mat[i, j]) <= allowed_error: #inclusive, like np.testing.assert_allclose in `_check_mst_vectorized`
+                        edges_in_adj_mat = False
+        return total, max_asymmetry, num_edges, edges_in_adj_mat
+else:
+    _check_mst_core = None
+
+
+def _check_mst_vectorized(adj_mat: np.ndarray, mst: np.ndarray, expected_weight: int, allowed_error: float):
+    """ 
+    Runs checks 1-3 of `check_mst` on the dense MST `mst` with numpy, one vectorized pass per check.
+    The checks are run from cheapest to most expensive, so an incorrect MST usually fails before the full matrix is compared.
+    Array comparisons use np.testing, whose failure message summarizes the mismatched elements instead of pytest printing whole arrays
+    """
+    #the indices of the lower triangle of the MST, its edges and their weights are computed once here and shared by the checks below, so the full matrix is only scanned once for them
+    tri_mask = np.tri(mst.shape[0], dtype=bool) #True in the lower triangle (including the diagonal)
+    lower_rows, lower_cols = (np.broadcast_to(idx, tri_mask.shape)[tri_mask] for idx in np.indices(tri_mask.shape, sparse=True)) #row and column of every element in the lower triangle. Same result as np.tril_indices, but faster to build
+    lower_vals = mst[lower_rows, lower_cols] #elements in the lower triangle of the MST
+    is_edge = lower_vals > 0 #elements in the lower triangle of the MST with weight > 0 are edges
+    edge_vals = lower_vals[is_edge] #weights of the edges in the lower triangle of the MST
+
+    #3) Check MST has expected number of edges
+    num_nodes = adj_mat.shape[0]
+    num_edges = edge_vals.size #number of edges in the lower triangle of the MST
+    assert num_edges == num_nodes - 1, "Proposed MST does not contain expected n-1 # of nodes" #test the MST has n-1 edges, where n is the number of nodes in the graph
+
+    total = float(edge_vals.sum()) #total weight of the MST, counting each edge once
+    assert math.isclose(total, expected_weight, abs_tol=allowed_error), 'Proposed MST has incorrect expected weight'
+
+    #1) Check proposed MST matrix is symmetric
+    np.testing.assert_allclose(lower_vals, mst[lower_cols, lower_rows], rtol=0, atol=allowed_error, err_msg='Proposed MST adjacency matrix is not symmetric') #Check each element in the lower triangle and its mirror in the upper triangle are identical within a very small threshold to test for symmetry. Only half the matrix is read and no transpose is built
+
+    #2) Check that all of the edges in MST are also in the adj_mat
+    np.testing.assert_allclose(edge_vals, adj_mat[lower_rows[is_edge], lower_cols[is_edge]], rtol=0, atol=allowed_error, err_msg='Proposed MST contains an edge not found in the original graph') #test each edge found in the MST is within allowed_error of the edge between the same nodes in the original adj_mat
 
 
 def check_mst(adj_mat: np.ndarray, 
@@ -13,7 +94,7 @@ def check_mst(adj_mat: np.ndarray,
     """ 
         Arguments:
             adj_mat: Adjacency matrix of full graph
-            mst: Adjacency matrix of proposed minimum spanning tree
+            mst: Adjacency matrix of proposed minimum spanning tree, either a dense numpy array or a scipy sparse matrix
             expected_weight: weight of the minimum spanning tree of the full graph
             allowed_error: Allowed difference between proposed MST weight and `expected_weight`
 
@@ -23,11 +104,11 @@ def check_mst(adj_mat: np.ndarray,
         1) Check proposed MST is symmetric: 
         Because the input graph is undirected, the MST adjacency matrix should be symmetric. This also checks that the upper triangle of the MST adjacency matrix
         has the expected edge weights, as the lower triangle was already validated by `check_mst` and this ensures the two triangles are identical.
-        This test checks for symmetry by checking that each element in the MST adjacency matrix and the same element in the transposed matrix are similar within a very small tolerance
+        This test checks for symmetry by checking that each element above the diagonal of the MST adjacency matrix and its mirror element below the diagonal are similar within `allowed_error`
         
         2) Check all edges in MST are also in adj_mat (i.e, there are no new edges)
-        The MST of adj_mat should not contain any edges that were not in adj_mat. This test tests that is the case by iterating through
-        each element in the lower triangle of the MST. If an edge exists (the element has weight > 0) between those nodes, check the edge of the same weight
+        The MST of adj_mat should not contain any edges that were not in adj_mat. This test tests that is the case by masking
+        the lower triangle of the MST. Wherever an edge exists (the element has weight > 0) between two nodes, check the edge of the same weight
         also exists between the same nodes in adj_mat. Because we have also tested for symmetry, only checking the lower triangle is sufficient.
         
         3) Check MST has expected number of edges
@@ -35,46 +116,29 @@ def check_mst(adj_mat: np.ndarray,
         portion of the MST. Beacuse we also checked for symmetry, only checking the lower triangle is sufficient.
 
         4) Check the MST is connected
-        MSTs are always connected, so this test tests the proposed MST is connected. It does this by importing the BFS class from project 2. 
-        This BFS class was adapted for this project to perform BFS on undirected graphs (rather than directed graphs like in project 2). Because the MST
-        is an undirected graph, performing BFS starting at any node will cause traversal of the whole tree. If the MST is connected, then every node will be traversed.
-        Therefore, running BFS --starting at an arbitrary node -- will cause traversal of the graph and should return every node in the graph in the list of nodes traversed.
-        Test that is the case by asserting the length of the list of bfs-traversed nodes is the same as the number of nodes in the graph
-    """
-    def approx_equal(a, b):
-        return abs(a - b) < allowed_error
-
-    total = 0
-    for i in range(mst.shape[0]):
-        for j in range(i+1): 
-            total += mst[i, j]
-    assert approx_equal(total, expected_weight), 'Proposed MST has incorrect expected weight'
-
-
-    #1) Check proposed MST matrix is symmetric
-    assert np.allclose(mst, mst.T), 'Proposed MST adjacency matrix is not symmetric' #Check each element in MST and its transpose are identical within a very small threshold to test for symmetry
-
+        MSTs are always connected, so this test tests the proposed MST is connected. It does this with scipy's `connected_components`, which labels
+        the connected components of the MST (treated as an undirected graph) in compiled code. If the MST is connected, every node is in the same
+        component. Test that is the case by asserting there is exactly one connected component
 
+        Checks 1-3 (and the weight check) run with numpy in `_check_mst_vectorized`. For MSTs with at least `CHECK_MST_COMPILED_MIN_NODES` nodes,
+        if numba is installed, they run in `_check_mst_core` instead, which does all of them in a single compiled pass over the lower triangle
+    """
+    if issparse(mst):
+        mst = mst.toarray() #`Graph.construct_mst` stores the MST as a sparse matrix; the checks below work on dense arrays
 
-    #2) Check that all of the edges in MST are also in the adj_mat
-    for i in range(mst.shape[0]):
-        for j in range(i+1): #iterate through elements in lower triangle of MST
-            if mst[i,j] > 0: #if an element in the lower triangle has weight > 0 it is an edge
-                assert approx_equal(mst[i,j], adj_mat[i,j]), 'Proposed MST contains an edge not found in the original graph' #test the edge found in the MST is approx_equal to the edge between the same nodes in the original adj_mat
-    
-    #3) Check MST has expected number of edges
-    num_edges = 0
     num_nodes = adj_mat.shape[0]
-    for i in range(mst.shape[0]):
-        for j in range(i+1): #iterate through elements in lower triangle of MST
-            if mst[i,j] > 0: #if element is an edge (i.e, weight > 0)
-                num_edges +=1 #add another edge to the tally of total edges
-    assert num_edges == num_nodes - 1, "Proposed MST does not contain expected n-1 # of nodes" #test the MST has n-1 edges, where n is the number of nodes in the graph
+    if _check_mst_core is not None and num_nodes >= CHECK_MST_COMPILED_MIN_NODES: #large MST and numba is installed: run checks 1-3 in one compiled pass
+        total, max_asymmetry, num_edges, edges_in_adj_mat = _check_mst_core(mst, adj_mat, allowed_error)
+        assert num_edges == num_nodes - 1, "Proposed MST does not contain expected n-1 # of nodes" #3)
+        assert math.isclose(total, expected_weight, abs_tol=allowed_error), 'Proposed MST has incorrect expected weight'
+        assert max_asymmetry <= allowed_error, 'Proposed MST adjacency matrix is not symmetric' #1) inclusive, like np.testing.assert_allclose in `_check_mst_vectorized`
+        assert edges_in_adj_mat, 'Proposed MST contains an edge not found in the original graph' #2)
+    else:
+        _check_mst_vectorized(adj_mat, mst, expected_weight, allowed_error)
 
     #4) Check if MST is connected 
-    mst_bfs = BFS(mst) #instantiate BFS class from project2 with mst matrix. the BFS class was adapted for this project to use an undirected graph (directed graphs were used in project 2)
-    bfs_traversal_list = mst_bfs.bfs(start=0) #arbitrarily choose 0th node to start traversal from. Doesn't matter where I start bfs because graph is undirected so it will always traverse the whole thing
-    assert len(bfs_traversal_list) == num_nodes #check that the number of nodes traversed via bfs is the same as the number of nodes in the graph, demonstrating connectivity
+    num_components, _ = connected_components(csr_matrix(mst), directed=False) #count the connected components of the undirected MST
+    assert num_components == 1, 'Proposed MST is not connected' #a connected graph has exactly one connected component
 
 
 
@@ -88,23 +152,53 @@ def test_mst_small():
     check_mst(g.adj_mat, g.mst, 8)
 
 
-def test_mst_single_cell_data():
-    """ Unit test for the construction of a minimum spanning tree using 
-    single cell data, taken from the Slingshot R package 
-    (https://bioconductor.org/packages/release/bioc/html/slingshot.html)
+@pytest.fixture(scope='module')
+def slingshot_dist():
+    """ 
+    Distance matrix of the single cell data, loaded and computed once and shared by every test that uses it.
+    Stored as float32, like the CSV graphs: the MST weight only needs to be within 1e-4, and half the bytes are read by every check of the matrix
     """
     file_path = './data/slingshot_example.txt'
     # load coordinates of single cells in low-dimensional subspace
-    coords = np.loadtxt(file_path)
+    coords = np.loadtxt(file_path, dtype=np.float32)
     # compute pairwise distances for all 140 cells to form an undirected weighted graph
-    dist_mat = pairwise_distances(coords)
-    g = Graph(dist_mat)
+    return pairwise_distances(coords).astype(np.float32, copy=False) #pdist always returns float64
+
+
+def test_mst_single_cell_data(slingshot_dist):
+    """ Unit test for the construction of a minimum spanning tree using 
+    single cell data, taken from the Slingshot R package 
+    (https://bioconductor.org/packages/release/bioc/html/slingshot.html)
+    """
+    g = Graph(slingshot_dist)
     g.construct_mst()
     check_mst(g.adj_mat, g.mst, 57.263561605571695)
 
 
+SMALL_UNIQUE_PATH = './data/small_unique.csv' #same as small.csv except one of the edges with weight 5 now has weight 3 and therefore all edge weights are unique
+
+
+def pytest_generate_tests(metafunc):
+    """ 
+    Parametrizes `test_find_unique_mst` with every node of `small_unique.csv` as the starting node.
+    The number of nodes is the number of rows in the CSV, counted without parsing it, so the `unique_graph` fixture is the only place a Graph is built
+    """
+    if 'starting_node' in metafunc.fixturenames:
+        with open(SMALL_UNIQUE_PATH) as f:
+            num_nodes = sum(1 for line in f if line.strip()) #one non-empty row per node
+        metafunc.parametrize('starting_node', range(num_nodes))
+
+
+@pytest.fixture(scope='module')
+def unique_graph():
+    """ Graph of `small_unique.csv` and its MST constructed starting at node 0, built once and shared by every case of `test_find_unique_mst` """
+    g = Graph(SMALL_UNIQUE_PATH) #instantiate Graph with unique edge weights
+    g.construct_mst(starting_node = 0)
+    return g, g.mst_dense
+
+
 #test_mst_student
-def test_find_unique_mst():
+def test_find_unique_mst(unique_graph, starting_node):
     """ TODO: Write at least one unit test for MST construction 
 
     If an undirected graph has unique weights for its edges (i.e, no two edges have the same weight) then
@@ -117,21 +211,232 @@ def test_find_unique_mst():
     because it now has a lower total weight --> proof by contradiction that a graph with unique edge weights has a unique MST
 
     This test therefore tests whether a graph with unique edge weights `small_unique.csv` has a unique mst by constructing 
-    the mst repeatedly and starting with a different starting node at each iteration. The resulting mst, no matter what node 
+    the mst starting with a different starting node in each case. The resulting mst, no matter what node 
     construction was started at, should be identical. This test asserts that is the case and tests for proper MST construction by showing that, if I input a graph with unique edge weights, a unique MST will be constructed
 
+    The test is parametrized over every starting node (see `pytest_generate_tests`), so each one passes or fails on its own. The graph and the
+    baseline mst, constructed starting at node 0, come from the module scoped `unique_graph` fixture, so the CSV is only read once.
     """
-    file_path = './data/small_unique.csv' #use small_unique.csv, which is the same as small.csv except one of the edges with weight 5 now has weight 3 and therefore all edge weights are unique
-    g = Graph(file_path) #instantiate Graph with unique edge weights
-    num_nodes = g.adj_mat.shape[0] #number of nodes in g
-    for starting_node in range(num_nodes):
-        g.construct_mst(starting_node = starting_node) #try constructing the mst for this graph starting with each possible starting node in the graph
-        if starting_node == 0:
-            baseline_mst = g.mst #the mst that comes from construction starting at node 0 will be compared to the mst constructed starting at each of the other nodes
-        else:
-            #this line tests that g.mst, which is the mst constructed starting with the starting_node at this iteration is similar within a very small tolerance to the mst constructed starting at node 0
-            #This tests for proper MST construction by showing that, if I input a graph with unique edge weights, a unique MST will be constructed
-            assert np.allclose(g.mst, baseline_mst), 'There is a problem with your MST construction because the MST for this graph should be unique!' 
+    g, baseline_mst = unique_graph
+    g.construct_mst(starting_node = starting_node)
+    #this line tests that the mst constructed starting with this starting_node is similar within a very small tolerance to the mst constructed starting at node 0
+    #This tests for proper MST construction by showing that, if I input a graph with unique edge weights, a unique MST will be constructed
+    np.testing.assert_allclose(g.mst_dense, baseline_mst, rtol=1e-05, atol=1e-08, err_msg='There is a problem with your MST construction because the MST for this graph should be unique!') #same tolerances as np.allclose
+
 
 
+@pytest.fixture(params=['compiled', 'python'])
+def prim_impl(request, monkeypatch):
+    """ 
+    Runs a test once with the compiled `_prim_csr` kernel (skipped if numba is not installed) and once with the pure python loop,
+    by hiding `_prim_csr` from `mst.graph`. Yields the name of the implementation in use
+    """
+    import mst.graph
+    if request.param == 'compiled' and mst.graph._prim_csr is None:
+        pytest.skip('numba is not installed')
+    if request.param == 'python':
+        monkeypatch.setattr(mst.graph, '_prim_csr', None)
+    yield request.param
+
 
+@pytest.fixture(params=['compiled', 'python'])
+def bfs_impl(request, monkeypatch):
+    """ 
+    Runs a test once with the compiled `_bfs_csr` kernel (skipped if numba is not installed) and once with the pure python loop,
+    by hiding `_bfs_csr` from `mst.bfs`. Yields the name of the implementation in use
+    """
+    import mst.bfs
+    if request.param == 'compiled' and mst.bfs._bfs_csr is None:
+        pytest.skip('numba is not installed')
+    if request.param == 'python':
+        monkeypatch.setattr(mst.bfs, '_bfs_csr', None)
+    yield request.param
+
+
+def test_compiled_mst_matches_python(monkeypatch, slingshot_dist):
+    """ 
+    If numba is installed, `construct_mst` runs Prim's algorithm with the compiled `_prim_csr` kernel instead of the pure python loop.
+    Both are meant to follow the same steps and break ties between edges of equal weight the same way, so this test constructs the MST of the
+    single cell data with the compiled kernel and again with the python loop (by hiding `_prim_csr` from `mst.graph`) and asserts the two MSTs are identical
+    """
+    pytest.importorskip('numba')
+    import mst.graph
+    dist_mat = slingshot_dist
+    g = Graph(dist_mat)
+    for starting_node in [0, dist_mat.shape[0] // 2]:
+        g.construct_mst(starting_node = starting_node) #compiled construction
+        compiled_mst = g.mst_dense
+        with monkeypatch.context() as m:
+            m.setattr(mst.graph, '_prim_csr', None)
+            g.construct_mst(starting_node = starting_node) #pure python construction
+        np.testing.assert_array_equal(g.mst_dense, compiled_mst, err_msg='Compiled and pure python MST construction disagree')
+
+
+def test_mst_bad_starting_node(prim_impl):
+    """ 
+    `construct_mst` should raise IndexError for a starting node outside the graph, with the compiled `_prim_csr` kernel (if numba is installed)
+    and with the pure python loop (see `prim_impl`). The kernel does no bounds checking, and the python loop would wrap a negative index around, so construct_mst checks it first
+    """
+    g = Graph('./data/small.csv')
+    for starting_node in [-1, 4, 10]: #small.csv has 4 nodes
+        with pytest.raises(IndexError):
+            g.construct_mst(starting_node = starting_node)
+
+
+def test_mst_disconnected_graph(prim_impl):
+    """ 
+    A disconnected graph has no spanning tree. `construct_mst` then stores the tree spanning only the component of the starting node,
+    with the compiled `_prim_csr` kernel (if numba is installed) and with the pure python loop (see `prim_impl`). This test builds a graph with two components,
+    {0, 1, 2} and {3, 4}, and checks the MST constructed from a node in each of them
+    """
+    adj_mat = np.array([[0, 1, 3, 0, 0],
+                        [1, 0, 2, 0, 0],
+                        [3, 2, 0, 0, 0],
+                        [0, 0, 0, 0, 4],
+                        [0, 0, 0, 4, 0]], dtype=np.float64)
+    g = Graph(adj_mat)
+
+    g.construct_mst(starting_node = 0)
+    expected = np.zeros_like(adj_mat)
+    expected[0, 1] = expected[1, 0] = 1
+    expected[1, 2] = expected[2, 1] = 2
+    np.testing.assert_array_equal(g.mst_dense, expected, err_msg='MST should only span the component of the starting node')
+
+    g.construct_mst(starting_node = 4)
+    expected = np.zeros_like(adj_mat)
+    expected[3, 4] = expected[4, 3] = 4
+    np.testing.assert_array_equal(g.mst_dense, expected, err_msg='MST should only span the component of the starting node')
+
+
+def test_mst_ignores_non_positive_weights(prim_impl):
+    """ 
+    Only elements of adj_mat with weight > 0 are edges. Negative and NaN weights must not be picked by `construct_mst`, even though
+    they are nonzero and so are stored in a sparse matrix. Here the -1 would otherwise be the lowest weight edge
+    """
+    adj_mat = np.array([[0, -1, 2],
+                        [-1, 0, 3],
+                        [2, 3, 0]], dtype=np.float64)
+    g = Graph(adj_mat)
+    g.construct_mst()
+    expected = np.array([[0, 0, 2],
+                         [0, 0, 3],
+                         [2, 3, 0]], dtype=np.float64)
+    np.testing.assert_array_equal(g.mst_dense, expected, err_msg='MST contains an edge with a weight that is not > 0')
+
+    adj_mat[0, 1] = adj_mat[1, 0] = np.nan
+    g = Graph(adj_mat)
+    g.construct_mst()
+    np.testing.assert_array_equal(g.mst_dense, expected, err_msg='MST contains an edge with a NaN weight')
+
+
+def test_load_csv_pandas_matches_loadtxt(monkeypatch, tmp_path):
+    """ 
+    If pandas is installed, `_load_csv` parses CSV files with it instead of np.loadtxt. This test loads every CSV in ./data with pandas and again
+    with np.loadtxt (by hiding pandas from `mst.graph`) and asserts the arrays are identical. It also checks both parsers reject a CSV with a short row
+    """
+    pytest.importorskip('pandas')
+    import glob
+    import mst.graph
+    from mst.graph import _load_csv
+    ragged_path = tmp_path / 'ragged.csv'
+    ragged_path.write_text('0,1,2\n1,0\n2,3,0\n')
+
+    paths = sorted(glob.glob('./data/*.csv'))
+    pandas_mats = [_load_csv(path) for path in paths]
+    with pytest.raises(ValueError):
+        _load_csv(str(ragged_path))
+    monkeypatch.setattr(mst.graph, 'pd', None)
+    for path, pandas_mat in zip(paths, pandas_mats):
+        loadtxt_mat = _load_csv(path)
+        assert pandas_mat.dtype == loadtxt_mat.dtype, f'pandas and np.loadtxt load {path} with different dtypes'
+        np.testing.assert_array_equal(pandas_mat, loadtxt_mat, err_msg=f'pandas and np.loadtxt disagree on {path}')
+    with pytest.raises(ValueError):
+        _load_csv(str(ragged_path))
+
+
+def test_kernel_index_arrays_int64_fallback():
+    """ 
+    `_kernel_index_arrays` converts CSR index arrays to int32 for the compiled kernels, unless there are more stored entries than int32 can count.
+    Such a graph is too large to build here, so this test checks the conversion on a stand-in CSR matrix with a huge indptr[-1], and checks that
+    `construct_mst` and `bfs` on a graph whose index arrays are int64 run the python loops and give the same results as with int32 arrays
+    """
+    from types import SimpleNamespace
+    from mst import BFS
+    from mst.graph import _kernel_index_arrays
+    small_indices = np.arange(3, dtype=np.int64)
+    indptr, indices = _kernel_index_arrays(SimpleNamespace(indptr=np.array([0, 3], dtype=np.int64), indices=small_indices))
+    assert indptr.dtype == indices.dtype == np.int32
+    indptr, indices = _kernel_index_arrays(SimpleNamespace(indptr=np.array([0, 2**31], dtype=np.int64), indices=small_indices))
+    assert indptr.dtype == indices.dtype == np.int64, 'Index arrays were narrowed to int32 even though int32 cannot count the stored entries'
+
+    g = Graph('./data/small.csv')
+    g.construct_mst()
+    int32_mst = g.mst_dense
+    g._indptr, g._indices = g._indptr.astype(np.int64), g._indices.astype(np.int64)
+    g.construct_mst()
+    np.testing.assert_array_equal(g.mst_dense, int32_mst, err_msg='MST construction with int64 index arrays disagrees with int32')
+
+    b = BFS('./data/small.csv')
+    int32_bfs = [b.bfs(start=0), b.bfs(start=3, end=0)]
+    b._indptr, b._indices = b._indptr.astype(np.int64), b._indices.astype(np.int64)
+    assert [b.bfs(start=0), b.bfs(start=3, end=0)] == int32_bfs, 'BFS with int64 index arrays disagrees with int32'
+
+
+def test_mst_reordered_graph():
+    """ 
+    Graphs with at least `RCM_MIN_NODES` nodes have their nodes renumbered before MST construction and BFS (see `_csr_adjacency` in graph.py).
+    This test builds a graph of random points that is large enough to be renumbered and checks, with `check_mst`, that the constructed MST is still 
+    expressed in the numbering of the original adjacency matrix. The expected weight comes from scipy's own MST implementation.
+    BFS on the MST is renumbered too, so the test also checks that a traversal reaches every node and that a shortest path only follows MST edges
+    and is reported in the original numbering.
+    """
+    from mst import BFS
+    from mst.graph import RCM_MIN_NODES
+    from scipy.sparse.csgraph import minimum_spanning_tree
+    rng = np.random.default_rng(0)
+    coords = rng.random((RCM_MIN_NODES + 44, 2))
+    dist_mat = pairwise_distances(coords)
+    g = Graph(dist_mat)
+    g.construct_mst(starting_node = 7)
+    check_mst(g.adj_mat, g.mst, minimum_spanning_tree(dist_mat).sum())
+    mst_dense = g.mst_dense
+    mst_bfs = BFS(mst_dense)
+    assert sorted(mst_bfs.bfs(start=7)) == list(range(dist_mat.shape[0])), 'BFS on the MST did not traverse every node'
+    path = mst_bfs.bfs(start=7, end=0)
+    assert path[0] == 7 and path[-1] == 0, 'BFS path does not run from start to end'
+    assert all(mst_dense[u, v] > 0 for u, v in zip(path, path[1:])), 'BFS path follows an edge that is not in the MST'
+
+
+def test_compiled_bfs_matches_python(monkeypatch, slingshot_dist):
+    """ 
+    If numba is installed, `BFS.bfs` runs the traversal with the compiled `_bfs_csr` kernel instead of the pure python loop.
+    This test runs bfs on the MST of the single cell data, and on the full graph, with the compiled kernel and again with the python loop
+    (by hiding `_bfs_csr` from `mst.bfs`), both without an end node (order of traversal) and with one (shortest path), and asserts the results are identical
+    """
+    pytest.importorskip('numba')
+    import mst.bfs
+    from mst import BFS
+    dist_mat = slingshot_dist
+    g = Graph(dist_mat)
+    g.construct_mst()
+    for adj_mat in [g.mst_dense, dist_mat]:
+        b = BFS(adj_mat)
+        compiled = [b.bfs(start=0), b.bfs(start=3, end=0), b.bfs(start=0, end=dist_mat.shape[0] - 1)]
+        with monkeypatch.context() as m:
+            m.setattr(mst.bfs, '_bfs_csr', None)
+            python = [b.bfs(start=0), b.bfs(start=3, end=0), b.bfs(start=0, end=dist_mat.shape[0] - 1)]
+        assert compiled == python, 'Compiled and pure python BFS disagree'
+
+
+def test_bfs_bad_start_node(bfs_impl):
+    """ 
+    `BFS.bfs` should raise IndexError for a start or end node outside the graph, with the compiled `_bfs_csr` kernel (if numba is installed)
+    and with the pure python loop (see `bfs_impl`). The kernel does no bounds checking and uses -1 for "no end node", so bfs checks both nodes first
+    """
+    from mst import BFS
+    b = BFS('./data/small.csv')
+    for node in [-1, 4, 10]: #small.csv has 4 nodes
+        with pytest.raises(IndexError):
+            b.bfs(start=node)
+        with pytest.raises(IndexError):
+            b.bfs(start=0, end=node)